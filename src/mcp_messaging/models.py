@@ -2,6 +2,8 @@
 
 from dataclasses import dataclass
 from datetime import datetime
+from enum import IntEnum
+from typing import Optional
 
 
 @dataclass
@@ -12,9 +14,22 @@ class Message:
     timestamp: datetime
 
 
-def format_relative_time(timestamp: datetime) -> str:
-    """Format timestamp as relative time (e.g., '5 minutes ago')."""
-    now = datetime.now()
+class SendStatus(IntEnum):
+    """Outcome of a send request."""
+    OK = 0
+    EMPTY_SENDER = 1
+    EMPTY_RECIPIENT = 2
+    EMPTY_CONTENT = 3
+
+
+def format_relative_time(timestamp: datetime, now: Optional[datetime] = None) -> str:
+    """Format timestamp as relative time (e.g., '5 minutes ago').
+
+    Pass ``now`` when formatting several timestamps in one go so they share a
+    single clock reading.
+    """
+    if now is None:
+        now = datetime.now()
     diff = now - timestamp
     
     if diff.days > 0:
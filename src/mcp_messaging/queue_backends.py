@@ -4,12 +4,15 @@ import asyncio
 import logging
 from abc import ABC, abstractmethod
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional
+from typing import Any, Dict, List, Optional
 
 from .models import Message, format_relative_time
 
 logger = logging.getLogger(__name__)
 
+_DIVIDER = "=" * 80
+
+
 def format_message_log(action: str, sender_id: str, recipient_id: str, message: str) -> str:
     """Format a message log entry with complete details."""
     return f"""
@@ -18,7 +21,7 @@ FROM: {sender_id}
 TO: {recipient_id}
 CONTENT:
 {message}
-{"=" * 80}"""
+{_DIVIDER}"""
 
 
 class QueueBackend(ABC):
@@ -48,6 +51,23 @@ class QueueBackend(ABC):
     async def notify_new_message(self, client_id: str) -> None:
         """Notify any blocked calls that new message arrived."""
         pass
+    
+    @abstractmethod
+    async def wait_and_pop(self, client_id: str, timeout: float) -> Optional[List[Message]]:
+        """Block until messages are available (or timeout) and pop them.
+        
+        Returns None on timeout, otherwise the popped messages (possibly empty).
+        """
+        pass
+    
+    @abstractmethod
+    def get_queue_stats(self) -> Dict[str, Any]:
+        """Get queue statistics.
+        
+        Returns a dict with total_queues, total_messages, active_waiters and
+        per_client_sizes (client_id -> number of queued messages).
+        """
+        pass
 
 
 class InMemoryQueueBackend(QueueBackend):
@@ -57,6 +77,7 @@ class InMemoryQueueBackend(QueueBackend):
         self.queues: Dict[str, List[Message]] = {}
         self.notification_events: Dict[str, asyncio.Event] = {}
         self.message_expiration_seconds = message_expiration_seconds
+        self._total_messages = 0
         logger.info(f"Initialized InMemoryQueueBackend (message expiration: {message_expiration_seconds}s)")
     
     async def send_message(self, recipient_id: str, message: Message) -> None:
@@ -66,7 +87,9 @@ class InMemoryQueueBackend(QueueBackend):
             logger.info(f"Created new queue for {recipient_id}")
         
         self.queues[recipient_id].append(message)
-        logger.info(format_message_log("queued", message.from_client_id, recipient_id, message.content))
+        self._total_messages += 1
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(format_message_log("queued", message.from_client_id, recipient_id, message.content))
     
     async def get_messages(self, client_id: str, pop: bool = True) -> List[Message]:
         """Get messages for client (and optionally remove them)."""
@@ -79,9 +102,11 @@ class InMemoryQueueBackend(QueueBackend):
         if pop:
             # Remove the queue entirely (pop all messages)
             del self.queues[client_id]
+            self._total_messages -= message_count
             # Log each retrieved message
-            for msg in messages:
-                logger.info(format_message_log("retrieved", msg.from_client_id, client_id, msg.content))
+            if logger.isEnabledFor(logging.INFO):
+                for msg in messages:
+                    logger.info(format_message_log("retrieved", msg.from_client_id, client_id, msg.content))
             logger.info(f"Popped {message_count} messages for {client_id}")
         else:
             logger.debug(f"Peeked at {message_count} messages for {client_id}")
@@ -105,6 +130,7 @@ class InMemoryQueueBackend(QueueBackend):
             
             cleaned_count = original_count - len(self.queues[recipient_id])
             if cleaned_count > 0:
+                self._total_messages -= cleaned_count
                 logger.info(f"Cleaned up {cleaned_count} expired messages for {recipient_id}")
             
             # Remove empty queues
@@ -149,10 +175,20 @@ class InMemoryQueueBackend(QueueBackend):
         else:
             logger.debug(f"No blocked calls waiting for {client_id}")
     
-    def get_queue_stats(self) -> Dict[str, int]:
-        """Get statistics about current queues (for debugging)."""
+    async def wait_and_pop(self, client_id: str, timeout: float) -> Optional[List[Message]]:
+        """Block until messages are available (or timeout) and pop them in one call."""
+        if not await self.wait_for_new_message(client_id, timeout):
+            return None
+        
+        # No suspension point between the wake-up and the drain, so no other
+        # task can take these messages in between
+        return await self.get_messages(client_id, pop=True)
+    
+    def get_queue_stats(self) -> Dict[str, Any]:
+        """Get statistics about current queues."""
         return {
             "total_queues": len(self.queues),
-            "total_messages": sum(len(msgs) for msgs in self.queues.values()),
-            "active_waiters": len(self.notification_events)
-        } 
\ No newline at end of file
+            "total_messages": self._total_messages,
+            "active_waiters": len(self.notification_events),
+            "per_client_sizes": {client_id: len(msgs) for client_id, msgs in self.queues.items()}
+        }
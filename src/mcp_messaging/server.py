@@ -2,22 +2,28 @@
 
 import argparse
 import asyncio
-import json
 import logging
 import os
+import time
+from collections import OrderedDict
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 
 import httpx
 import uvicorn
 from dotenv import load_dotenv
 from mcp.server.fastmcp import FastMCP
 from starlette.requests import Request
-from starlette.responses import JSONResponse
+from starlette.responses import JSONResponse, Response
 # Removed pydantic BaseModel - no longer needed
 
-from .models import Message, format_relative_time
+try:
+    import orjson  # Optional: faster JSON for the /api/sessions endpoint
+except ImportError:
+    orjson = None
+
+from .models import Message, SendStatus, format_relative_time
 from .queue_backends import QueueBackend, InMemoryQueueBackend
 
 # Load environment variables
@@ -34,15 +40,25 @@ logger = logging.getLogger(__name__)
 DEFAULT_CONFIG = {
     "max_tokens": 4096,
     "max_iterations": 10,
+    "max_tracked_clients": 1024,
     "timeouts": {
         "send_message_and_wait": 180.0,  # 3 minutes
         "get_messages": 60.0,  # 1 minute
-        "message_expiration": 300.0  # 5 minutes
+        "message_expiration": 300.0,  # 5 minutes
+        "cleanup_interval": 5.0,  # Minimum seconds between expired-message sweeps
+        "session_snapshot_ttl": 1.0  # Seconds to reuse a /api/sessions snapshot
     }
 }
 
-# Global client tracking (in-memory)
-client_activity_tracking: Dict[str, Dict] = {}
+# Global client tracking (in-memory, least recently seen first)
+client_activity_tracking: "OrderedDict[str, Dict]" = OrderedDict()
+
+def track_client(client_id: str, client_info: Dict) -> None:
+    """Store client info, evicting the least recently seen clients beyond the cap."""
+    client_activity_tracking[client_id] = client_info
+    client_activity_tracking.move_to_end(client_id)
+    while len(client_activity_tracking) > DEFAULT_CONFIG["max_tracked_clients"]:
+        client_activity_tracking.popitem(last=False)
 
 def update_client_activity(recipients_config: Dict, queue_backend: Optional[QueueBackend] = None) -> None:
     """Update client activity tracking from required recipients_config."""
@@ -66,7 +82,7 @@ def update_client_activity(recipients_config: Dict, queue_backend: Optional[Queu
         client_info["messages_in_queue"] = len(queue_messages)
     
     # Store in global tracking
-    client_activity_tracking[client_id] = client_info
+    track_client(client_id, client_info)
 
 # Configuration management removed - now handled by clients
 
@@ -76,6 +92,9 @@ def update_client_activity(recipients_config: Dict, queue_backend: Optional[Queu
 # Callback functionality removed - unified client approach
 
 
+_DIVIDER = "=" * 80
+
+
 def format_message_log(action: str, sender_id: str, recipient_id: str, message: str) -> str:
     """Format a message log entry with complete details."""
     return f"""
@@ -84,7 +103,20 @@ FROM: {sender_id}
 TO: {recipient_id}
 CONTENT:
 {message}
-{"=" * 80}"""
+{_DIVIDER}"""
+
+def _validate_ids(sender_id: str, recipient_id: str, content: str) -> Tuple[SendStatus, str]:
+    """Validate a send request, returning its status and any error/warning message."""
+    if not sender_id.strip():
+        return SendStatus.EMPTY_SENDER, "❌ **Error**: Sender ID cannot be empty"
+    
+    if not recipient_id.strip():
+        return SendStatus.EMPTY_RECIPIENT, "❌ **Error**: Recipient ID cannot be empty"
+    
+    if not content.strip():
+        return SendStatus.EMPTY_CONTENT, "⚠️ **Warning**: Sending empty message"
+    
+    return SendStatus.OK, ""
 
 # Client type detection removed - all clients treated uniformly
 
@@ -97,23 +129,31 @@ class MessagingServer:
     
     def __init__(self, queue_backend: Optional[QueueBackend] = None) -> None:
         self.queue_backend = queue_backend or InMemoryQueueBackend()
+        self._last_cleanup_ts: float = float("-inf")
         logger.info(f"MessagingServer initialized with {type(self.queue_backend).__name__}")
     
+    async def _cleanup_expired_messages(self) -> None:
+        """Run the backend's expired-message sweep at most once per cleanup interval."""
+        now = time.monotonic()
+        if now - self._last_cleanup_ts > DEFAULT_CONFIG["timeouts"]["cleanup_interval"]:
+            await self.queue_backend.cleanup_expired_messages()
+            self._last_cleanup_ts = now
+    
     async def send_message(self, sender_id: str, recipient_id: str, content: str) -> str:
         """Send a message from sender to recipient."""
+        _, result = await self._send_message(sender_id, recipient_id, content)
+        return result
+    
+    async def _send_message(self, sender_id: str, recipient_id: str, content: str) -> Tuple[SendStatus, str]:
+        """Send a message from sender to recipient, returning status and markdown result."""
         
-        # Cleanup expired messages before processing
-        await self.queue_backend.cleanup_expired_messages()
-        
-        # Validate inputs
-        if not sender_id.strip():
-            return "❌ **Error**: Sender ID cannot be empty"
+        # Validate inputs before touching the backend
+        status, validation_error = _validate_ids(sender_id, recipient_id, content)
+        if status is not SendStatus.OK:
+            return status, validation_error
         
-        if not recipient_id.strip():
-            return "❌ **Error**: Recipient ID cannot be empty"
-            
-        if not content.strip():
-            return "⚠️ **Warning**: Sending empty message"
+        # Cleanup expired messages before processing
+        await self._cleanup_expired_messages()
         
         # Create message
         message = Message(
@@ -129,9 +169,10 @@ class MessagingServer:
         await self.queue_backend.notify_new_message(recipient_id)
         
         # Log complete message details
-        logger.info(format_message_log("sent", sender_id, recipient_id, content))
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(format_message_log("sent", sender_id, recipient_id, content))
         
-        return f"✅ **Message sent successfully** to `{recipient_id}`"
+        return SendStatus.OK, f"✅ **Message sent successfully** to `{recipient_id}`"
     
     async def send_message_and_wait(self, sender_id: str, recipient_id: str, content: str) -> str:
         """Send a message and wait for a response (blocking call)."""
@@ -139,26 +180,24 @@ class MessagingServer:
         timeout = DEFAULT_CONFIG["timeouts"]["send_message_and_wait"]
         
         # First, send the message
-        send_result = await self.send_message(sender_id, recipient_id, content)
+        status, send_result = await self._send_message(sender_id, recipient_id, content)
         
         # If send failed, return the error
-        if send_result.startswith("❌") or send_result.startswith("⚠️"):
+        if status is not SendStatus.OK:
             return send_result
         
         logger.info(f"Waiting for response to {sender_id} (timeout: {timeout}s)")
         
-        # Wait for a response to arrive in sender's queue
-        message_arrived = await self.queue_backend.wait_for_new_message(sender_id, timeout)
+        # Wait for a response to arrive in sender's queue and pop it
+        messages = await self.queue_backend.wait_and_pop(sender_id, timeout)
         
-        if message_arrived:
-            # Get the response messages
-            messages = await self.queue_backend.get_messages(sender_id, pop=True)
-            if messages:
-                return self._format_messages_as_markdown(sender_id, messages)
-            else:
-                return "📭 **No response received** (queue was empty)"
-        else:
+        if messages is None:
             return f"⏰ **Timeout**: No response received within {timeout} seconds"
+        
+        if messages:
+            return self._format_messages_as_markdown(sender_id, messages)
+        else:
+            return "📭 **No response received** (queue was empty)"
     
     async def send_message_without_waiting(self, sender_id: str, recipients: List[str], messages: List[str]) -> str:
         """Send messages (fire and forget) to multiple recipients and return any pending messages for sender."""
@@ -177,9 +216,9 @@ class MessagingServer:
         failed_sends = []
         
         for recipient_id, content in zip(recipients, messages):
-            send_result = await self.send_message(sender_id, recipient_id, content)
+            status, send_result = await self._send_message(sender_id, recipient_id, content)
             
-            if send_result.startswith("❌") or send_result.startswith("⚠️"):
+            if status is not SendStatus.OK:
                 failed_sends.append(f"  - **{recipient_id}**: {send_result}")
             else:
                 send_results.append(f"  - **{recipient_id}**: ✅ Message sent")
@@ -200,7 +239,7 @@ class MessagingServer:
             result_parts.extend(["**❌ Failed sends:**"] + failed_sends + [""])
         
         # Get any pending messages for the sender (non-blocking)
-        await self.queue_backend.cleanup_expired_messages()
+        await self._cleanup_expired_messages()
         pending_messages_list = await self.queue_backend.get_messages(sender_id, pop=True)
         
         if pending_messages_list:
@@ -218,33 +257,22 @@ class MessagingServer:
         # Use default timeout
         timeout = DEFAULT_CONFIG["timeouts"]["get_messages"]
         
-        # Cleanup expired messages before processing
-        await self.queue_backend.cleanup_expired_messages()
-        
-        # Validate input
+        # Validate input before touching the backend
         if not sender_id.strip():
             return "❌ **Error**: Sender ID cannot be empty"
         
-        # Get messages from queue backend
-        messages = await self.queue_backend.get_messages(sender_id, pop=True)
+        # Cleanup expired messages before processing
+        await self._cleanup_expired_messages()
+        
+        # Pop pending messages, blocking for configured timeout if there are none
+        messages = await self.queue_backend.wait_and_pop(sender_id, timeout)
+        
+        if messages is None:
+            logger.debug(f"Timeout waiting for messages for {sender_id}")
+            return "📭 **No messages** for you right now.\n\n💡 **Tip:** Be sure you are using your sender_id (`my_sender_id`) from your `mcp_recipients.json` file, and try again."
         
         if not messages:
-            # No messages found - block for configured timeout
-            logger.debug(f"No messages found for {sender_id}, waiting {timeout} seconds...")
-            
-            message_arrived = await self.queue_backend.wait_for_new_message(sender_id, timeout)
-            
-            if message_arrived:
-                # Get the new messages that arrived
-                messages = await self.queue_backend.get_messages(sender_id, pop=True)
-                if messages:
-                    logger.info(f"Retrieved {len(messages)} messages for {sender_id} after waiting")
-                    return self._format_messages_as_markdown(sender_id, messages)
-                else:
-                    return "📭 **No messages** for you right now."
-            else:
-                logger.debug(f"Timeout waiting for messages for {sender_id}")
-                return "📭 **No messages** for you right now.\n\n💡 **Tip:** Be sure you are using your sender_id (`my_sender_id`) from your `mcp_recipients.json` file, and try again."
+            return "📭 **No messages** for you right now."
         
         logger.info(f"Retrieved and popped {len(messages)} messages for {sender_id}")
         return self._format_messages_as_markdown(sender_id, messages)
@@ -253,44 +281,17 @@ class MessagingServer:
         """Format a list of messages as markdown."""
         if not messages:
             return "📭 **No messages** for you right now."
-        
-        # Format each message
-        message_parts = [
-            f"📬 **{len(messages)} message{'s' if len(messages) > 1 else ''} for `{sender_id}`:**\n"
-        ]
-        
+
+        return "\n".join(self._iter_markdown(sender_id, messages))
+
+    def _iter_markdown(self, sender_id: str, messages: List[Message]):
+        """Yield the markdown header followed by one block per message."""
+        message_count = len(messages)
+        now = datetime.now()
+        yield f"📬 **{message_count} message{'' if message_count == 1 else 's'} for `{sender_id}`:**\n"
+
         for msg in messages:
-            relative_time = format_relative_time(msg.timestamp)
-            message_parts.append(f"**From:** `{msg.from_client_id}` ({relative_time})\n{msg.content}\n")
-        
-        return "\n".join(message_parts)
-    
-    def checkin_client(self, client_id: str, name: str, capabilities: str) -> str:
-        """Client checkin (for future features, currently just logs)."""
-        if not client_id.strip():
-            return "❌ **Error**: Client ID cannot be empty"
-        
-        # Create/update client info in tracking
-        client_info = {
-            "client_id": client_id,
-            "name": name,
-            "description": capabilities,
-            "clientType": "checked-in client",
-            "last_seen": datetime.now().isoformat(),
-            "messages_in_queue": 0  # Will be updated below
-        }
-        
-        # Update messages in queue count
-        if hasattr(self.queue_backend, 'queues'):
-            queue_messages = self.queue_backend.queues.get(client_id, [])
-            client_info["messages_in_queue"] = len(queue_messages)
-        
-        # Store in global tracking
-        client_activity_tracking[client_id] = client_info
-        
-        logger.info(f"Client checkin - ID: {client_id}, Name: {name}, Capabilities: {capabilities}")
-        
-        return f"👋 **Checked in successfully** as `{client_id}`  \n**Name:** {name}  \n**Capabilities:** {capabilities}"
+            yield f"**From:** `{msg.from_client_id}` ({format_relative_time(msg.timestamp, now)})\n{msg.content}\n"
 
 
 # Initialize the messaging server and FastMCP
@@ -323,19 +324,31 @@ async def checkin_client(client_id: str, name: str, capabilities: str = "Generic
     
     **Note:** For correct identity and attribution, always use the values from your configured `mcp_recipients.json` file. If you are unsure, ask your project lead for the correct configuration.
     """
-    # Update client activity tracking
-    result = messaging_server.checkin_client(client_id, name, capabilities)
+    cid = client_id.strip()
+    if not cid:
+        return "❌ **Error**: Client ID cannot be empty"
     
-    # Store activity tracking info
-    client_activity_tracking[client_id] = {
-        "client_id": client_id,
+    # Update client activity tracking
+    track_client(cid, {
+        "client_id": cid,
         "name": name,
-        "capabilities": capabilities,
-        "last_checkin": datetime.now().isoformat(),
-        "message_count": len(messaging_server.queue_backend.queues.get(client_id, []))
-    }
+        "description": capabilities,
+        "clientType": "checked-in client",
+        "last_seen": datetime.now().isoformat(),
+        "messages_in_queue": len(messaging_server.queue_backend.queues.get(cid, []))
+    })
     
-    return result
+    logger.info(f"Client checkin - ID: {cid}, Name: {name}, Capabilities: {capabilities}")
+    
+    return f"👋 **Checked in successfully** as `{cid}`  \n**Name:** {name}  \n**Capabilities:** {capabilities}"
+
+
+# Emphasized footer appended to send_message_and_wait messages, keyed by expectation
+_EXPECTATION_TEXT = {
+    "response_expected": "**📬 I expect a response via send_message_and_wait**",
+    "no_response": "**📭 I do not expect a response**",
+    "end_conversation": "**🔚 End of conversation**"
+}
 
 
 async def send_message_and_wait(sender_id: str, recipient_id: str, message: str, expectation: str = "response_expected") -> str:
@@ -362,13 +375,7 @@ async def send_message_and_wait(sender_id: str, recipient_id: str, message: str,
         The response message(s) in markdown format, or timeout message (3 minute timeout)
     """
     # Append expectation to message with emphasis
-    expectation_text = {
-        "response_expected": "**📬 I expect a response via send_message_and_wait**",
-        "no_response": "**📭 I do not expect a response**", 
-        "end_conversation": "**🔚 End of conversation**"
-    }
-    
-    formatted_message = f"{message}\n\n---\n{expectation_text.get(expectation, expectation_text['response_expected'])}"
+    formatted_message = f"{message}\n\n---\n{_EXPECTATION_TEXT.get(expectation, _EXPECTATION_TEXT['response_expected'])}"
     
     # Fire and forget for no_response - don't block
     if expectation == "no_response":
@@ -484,55 +491,67 @@ Remember: Always use your my_sender_id from this file - do not generate arbitrar
 
 
 
-async def _get_active_sessions_internal() -> str:
-    """Internal function to get information about active messaging clients.
+# Last session snapshot as (time.monotonic() timestamp, snapshot)
+_session_snapshot_cache: Optional[Tuple[float, Dict]] = None
+
+
+def _collect_session_snapshot() -> Dict:
+    """Collect information about active messaging clients and queue statistics.
+    
+    Snapshots are cached briefly so bursts of polls don't re-walk the queues.
     
     Returns:
-        JSON information about recently active messaging clients including last seen times
+        Dict of recently active messaging clients (including last seen times) and queue stats
     """
-    try:
-        # Get queue statistics
-        if hasattr(messaging_server.queue_backend, 'get_queue_stats'):
-            queue_stats = messaging_server.queue_backend.get_queue_stats()
-        else:
-            queue_stats = {
-                "total_queues": len(getattr(messaging_server.queue_backend, 'queues', {})),
-                "total_messages": sum(len(msgs) for msgs in getattr(messaging_server.queue_backend, 'queues', {}).values()),
-                "active_waiters": len(getattr(messaging_server.queue_backend, 'notification_events', {}))
-            }
-        
-        # Update message counts for all queues, even if client isn't tracked
-        messaging_clients = []
-        for client_id, queue in messaging_server.queue_backend.queues.items():
-            client_info = client_activity_tracking.get(client_id, {
+    global _session_snapshot_cache
+    
+    now = time.monotonic()
+    if _session_snapshot_cache is not None:
+        cached_at, snapshot = _session_snapshot_cache
+        if now - cached_at < DEFAULT_CONFIG["timeouts"]["session_snapshot_ttl"]:
+            return snapshot
+    
+    # Get queue statistics (per-client sizes are reported per client below)
+    queue_stats = messaging_server.queue_backend.get_queue_stats()
+    per_client_sizes = queue_stats.pop("per_client_sizes")
+
+    # Message counts for all queues, even if client isn't tracked, followed by
+    # tracked clients that don't have queues
+    last_seen = datetime.now().isoformat()
+    messaging_clients = [
+        {
+            **client_activity_tracking.get(client_id, {
                 "client_id": client_id,
                 "name": client_id,
                 "description": "Client with messages in queue",
                 "clientType": "untracked client",
-                "last_seen": datetime.now().isoformat()
-            })
-            client_info["messages_in_queue"] = len(queue)
-            messaging_clients.append(client_info)
-        
-        # Add tracked clients that don't have queues
-        for client_id, client_info in client_activity_tracking.items():
-            if client_id not in messaging_server.queue_backend.queues:
-                client_info["messages_in_queue"] = 0
-                messaging_clients.append(client_info)
-        
-        # Create the response structure with total_messages at root level for frontend compatibility
-        response = {
-            "messagingClients": messaging_clients,
-            "queueStats": queue_stats,
-            "total_messages": queue_stats["total_messages"]  # Add total_messages at root level
+                "last_seen": last_seen
+            }),
+            "messages_in_queue": queue_size
         }
-        
-        return json.dumps(response, indent=2)
-        
-    except Exception as e:
-        logger.error(f"Error getting session info: {e}")
-        error_msg = f"❌ **Error**: Could not retrieve session information: {str(e)}"
-        return error_msg
+        for client_id, queue_size in per_client_sizes.items()
+    ] + [
+        {**client_info, "messages_in_queue": 0}
+        for client_id, client_info in client_activity_tracking.items()
+        if client_id not in per_client_sizes
+    ]
+    
+    # Create the response structure with total_messages at root level for frontend compatibility
+    snapshot = {
+        "messagingClients": messaging_clients,
+        "queueStats": queue_stats,
+        "total_messages": queue_stats["total_messages"]  # Add total_messages at root level
+    }
+    
+    _session_snapshot_cache = (now, snapshot)
+    return snapshot
+
+
+def _json_response(data: Dict, headers: Dict[str, str]) -> Response:
+    """Build a JSON response, serialized with orjson when it is installed."""
+    if orjson is not None:
+        return Response(content=orjson.dumps(data), media_type="application/json", headers=headers)
+    return JSONResponse(content=data, headers=headers)
 
 
 @mcp.custom_route("/api/sessions", methods=["GET", "OPTIONS"])
@@ -548,17 +567,15 @@ async def get_sessions_json(request):
         return JSONResponse(content={}, headers=headers)
     
     try:
-        # Call our internal get_active_sessions function
-        result = await _get_active_sessions_internal()
+        data = _collect_session_snapshot()
         
-        # Parse the JSON result and return as JSONResponse with CORS headers
-        data = json.loads(result)
+        # Return the snapshot as JSON with CORS headers
         headers = {
             "Access-Control-Allow-Origin": "*",
             "Access-Control-Allow-Methods": "GET, OPTIONS",
             "Access-Control-Allow-Headers": "Content-Type, Authorization"
         }
-        return JSONResponse(content=data, headers=headers)
+        return _json_response(data, headers)
         
     except Exception as e:
         logger.error(f"Error getting session JSON: {e}")
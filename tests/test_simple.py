@@ -3,8 +3,9 @@
 import asyncio
 from datetime import datetime
 
-from mcp_messaging.server import MessagingServer
+from mcp_messaging.server import MessagingServer, checkin_client
 from mcp_messaging.models import Message
+from mcp_messaging.queue_backends import InMemoryQueueBackend
 
 
 async def test_basic_messaging():
@@ -23,11 +24,43 @@ async def test_basic_messaging():
 
 async def test_client_checkin():
     """Test client checkin functionality."""
-    server = MessagingServer()
+    result = await checkin_client(" client1 ", "Test Client", "Test capabilities")
+    assert "Checked in successfully" in result
+    assert "`client1`" in result
+    
+    result = await checkin_client("  ", "Test Client", "Test capabilities")
+    assert "❌ **Error**" in result
+
+
+async def test_queue_stats():
+    """Test queue statistics track sends and pops."""
+    backend = InMemoryQueueBackend()
+    
+    await backend.send_message("client1", Message("sender1", "one", datetime.now()))
+    await backend.send_message("client1", Message("sender1", "two", datetime.now()))
+    await backend.send_message("client2", Message("sender1", "three", datetime.now()))
+    
+    stats = backend.get_queue_stats()
+    assert stats["total_queues"] == 2
+    assert stats["total_messages"] == 3
+    assert stats["per_client_sizes"] == {"client1": 2, "client2": 1}
+    
+    await backend.get_messages("client1", pop=True)
+    stats = backend.get_queue_stats()
+    assert stats["total_messages"] == 1
+    assert stats["per_client_sizes"] == {"client2": 1}
+
+
+async def test_wait_and_pop():
+    """Test wait_and_pop drains pending messages and times out on an empty queue."""
+    backend = InMemoryQueueBackend()
+    
+    assert await backend.wait_and_pop("client1", timeout=0.01) is None
     
-    result = server.checkin_client("client1", "Test Client", "Test capabilities")
-    assert "✅ Successfully checked in" in result
-    assert "client1" in result
+    await backend.send_message("client1", Message("sender1", "Hello", datetime.now()))
+    messages = await backend.wait_and_pop("client1", timeout=0.01)
+    assert [msg.content for msg in messages] == ["Hello"]
+    assert backend.get_queue_stats()["total_messages"] == 0
 
 
 def test_message_model():
@@ -48,5 +81,7 @@ if __name__ == "__main__":
     # Run the async tests
     asyncio.run(test_basic_messaging())
     asyncio.run(test_client_checkin())
+    asyncio.run(test_queue_stats())
+    asyncio.run(test_wait_and_pop())
     test_message_model()
     print("✅ All basic tests passed!") 
\ No newline at end of file